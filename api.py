@@ -15,41 +15,200 @@
 # lo cual es fundamental para nuestro servicio de consultoria ambiental.
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
+import sys
 from dotenv import load_dotenv
 
+# orjson es opcional: si no esta instalado se usa el json de la libreria estandar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Rangos AQI: limite superior de cada rango y su etiqueta correspondiente
+_AQI_LIMITES = (50, 100, 150, 200, 300)
+_AQI_CLASIFICACION = ('Bueno', 'Moderado', 'Danino para grupos sensibles',
+                      'Danino', 'Muy danino', 'Peligroso')
+_AQI_NIVEL = ('BAJO', 'MEDIO', 'ALTO', 'ALTO', 'CRITICO', 'CRITICO')
+_AQI_RECOMENDACIONES = (
+    ("  Calidad del aire optima", "  Buenas condiciones para actividades exteriores"),
+    ("  Calidad aceptable, monitorear", "  Considerar estrategias preventivas"),
+    ("  ALERTA: Implementar medidas inmediatas", "  Limitar actividades contaminantes"),
+    ("  ALERTA: Implementar medidas inmediatas", "  Limitar actividades contaminantes"),
+    ("  CRITICO: Plan de emergencia", "  Suspender actividades no esenciales"),
+    ("  CRITICO: Plan de emergencia", "  Suspender actividades no esenciales"),
+)
+
+
+# Clasificacion, nivel de peligro y recomendaciones para un AQI entero
+@lru_cache(maxsize=512)
+def _info_aqi(aqi):
+    i = bisect_left(_AQI_LIMITES, aqi)
+    return _AQI_CLASIFICACION[i], _AQI_NIVEL[i], _AQI_RECOMENDACIONES[i]
+
+
+# Plantilla del informe de consola (las recomendaciones se agregan aparte)
+_INFORME_TMPL = "\n".join([
+    "\n" + "=" * 70,
+    " INFORME DE CALIDAD DEL AIRE - EcoTech Solutions",
+    "=" * 70,
+    "\nEstacion: {estacion}",
+    "Fecha/Hora: {tiempo}{linea_coordenadas}",
+    "\nIndice AQI: {aqi}",
+    "Clasificacion: {clasificacion}",
+    "Nivel de Peligro: {nivel}",
+    "\nCONTAMINANTES:",
+    "-" * 70,
+    "  PM2.5: {pm25}",
+    "  PM10: {pm10}",
+    "  O3 (Ozono): {o3}",
+    "  NO2: {no2}",
+    "  SO2: {so2}",
+    "  CO: {co}",
+    "\nCONDICIONES METEOROLOGICAS:",
+    "-" * 70,
+    "  Temperatura: {temp}C",
+    "  Humedad: {humedad}%",
+    "  Presion: {presion} hPa",
+    "\nANALISIS PARA ECOTECH:",
+    "-" * 70,
+])
+
+
+# Parsear JSON desde bytes (orjson si esta disponible)
+def _json_loads(contenido):
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+
+# Serializar a JSON con indentacion, conservando caracteres no ASCII
+def _json_dumps(datos):
+    if orjson is not None:
+        return orjson.dumps(datos, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+    return json.dumps(datos, indent=2, ensure_ascii=False)
+
+
 # Error para cuando falla la API
 class APIError(Exception):
     pass
 
 # Clase para consumir la API de calidad del aire
+# Es un singleton: todas las partes de la app comparten la sesion HTTP y la cache
 class ServicioAPI:
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+    
     def __init__(self):
+        # Solo se inicializa la primera vez
+        if self._initialized:
+            return
+        self._initialized = True
+        
         # URL base de la API
         self.url = "https://api.waqi.info"
         # Token protegido en .env (DATO SENSIBLE)
         self.token = os.getenv('API_TOKEN', 'demo')  # 'demo' es fallback para pruebas
+        # Sesion HTTP reutilizable (keep-alive, evita un handshake TLS por consulta)
+        self.session = requests.Session()
+        reintentos = Retry(total=3, backoff_factor=0.3,
+                           status_forcelist=[429, 500, 502, 503, 504])
+        self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                                   max_retries=reintentos))
+        # Accept-Encoding ya lo pone requests (incluye 'br' si brotli esta instalado)
+        self.session.headers['User-Agent'] = 'EcoTech/1.0'
+        # Cache en memoria por ciudad: {ciudad: (timestamp, info, last_modified)}
+        # Las estaciones AQICN se actualizan aprox. cada hora, 15 min es suficiente
+        self._cache = {}
+        self._cache_ttl = 900
     
-    # Obtener datos de calidad del aire
+    # Cerrar la sesion HTTP cuando ya no se use el servicio
+    def close(self):
+        self.session.close()
+    
+    # Vaciar la cache de consultas
+    def clear_cache(self):
+        self._cache.clear()
+    
+    # Obtener datos de calidad del aire (usa la cache si el dato sigue vigente)
     def get_calidad_aire(self, ciudad="Mexico"):
+        clave = ciudad.strip().lower()
+        entrada = self._cache.get(clave)
+        if entrada and time.time() - entrada[0] < self._cache_ttl:
+            return entrada[1]
+        
+        # Si ya tenemos el dato, se pide solo si cambio (If-Modified-Since)
+        last_modified = entrada[2] if entrada else None
+        try:
+            info, last_modified = self._consultar_api(ciudad, last_modified)
+        except APIError as e:
+            # Si la API falla pero tenemos un dato anterior, lo devolvemos aunque este vencido
+            if entrada:
+                logger.warning("API no disponible (%s), usando cache de '%s'", e, ciudad)
+                return entrada[1]
+            raise
+        
+        if info is None:
+            # 304 Not Modified: el dato guardado sigue siendo el actual
+            info = entrada[1]
+        self._cache[clave] = (time.time(), info, last_modified)
+        return info
+    
+    # Obtener datos de varias ciudades en paralelo (comparten la sesion HTTP)
+    # Retorna {ciudad: info} en el mismo orden de la lista; si una ciudad falla,
+    # su valor es el APIError y el resto de resultados se conserva
+    def get_calidad_aire_ciudades(self, ciudades):
+        if not ciudades:
+            return {}
+        # max_workers <= pool_maxsize del HTTPAdapter para no descartar conexiones
+        with ThreadPoolExecutor(max_workers=min(8, len(ciudades))) as ex:
+            return dict(zip(ciudades, ex.map(self._calidad_aire_o_error, ciudades)))
+    
+    # get_calidad_aire que devuelve el APIError en vez de lanzarlo (para los hilos)
+    def _calidad_aire_o_error(self, ciudad):
+        try:
+            return self.get_calidad_aire(ciudad)
+        except APIError as e:
+            return e
+    
+    # Consultar la API directamente (sin cache)
+    # Retorna (info, last_modified); info es None si la API responde 304
+    def _consultar_api(self, ciudad, last_modified=None):
         try:
             url = f"{self.url}/feed/{ciudad}/?token={self.token}"
             # print(f"Consultando API: {url}")  # debug
             
-            response = requests.get(url, timeout=10)
+            headers = {'If-Modified-Since': last_modified} if last_modified else None
+            response = self.session.get(url, timeout=(3.05, 10), headers=headers)
+            if response.status_code == 304:
+                return None, last_modified
             response.raise_for_status()
             
-            datos = response.json()
+            datos = _json_loads(response.content)
             
             if datos.get('status') != 'ok':
                 raise APIError(f"API error: {datos.get('data', 'unknown')}")
             
             info = self._procesar_datos(datos['data'])
-            return info
+            return info, response.headers.get('Last-Modified')
             
         except requests.exceptions.Timeout:
             raise APIError("Timeout conectando a la API")
@@ -57,7 +216,7 @@ class ServicioAPI:
             raise APIError("No se pudo conectar")
         except requests.exceptions.HTTPError as e:
             raise APIError(f"HTTP error: {e}")
-        except json.JSONDecodeError:
+        except json.JSONDecodeError:  # orjson.JSONDecodeError hereda de esta
             raise APIError("Error parseando JSON")
         except Exception as e:
             raise APIError(f"Error: {e}")
@@ -65,143 +224,91 @@ class ServicioAPI:
     # Procesar los datos que vienen de la API (deserializacion JSON)
     def _procesar_datos(self, datos):
         aqi = datos.get('aqi', 'N/A')
-        estacion = datos.get('city', {}).get('name', 'Desconocida')
-        coords = datos.get('city', {}).get('geo', [])
+        city = datos.get('city') or {}
+        estacion = city.get('name', 'Desconocida')
+        coords = city.get('geo', [])
         iaqi = datos.get('iaqi', {})
+        v = self._v
         tiempo = datos.get('time', {}).get('s', 'N/A')
+        # Convertir el AQI una sola vez (puede venir como '-' o 'N/A')
+        try:
+            aqi_int = int(aqi)
+        except (ValueError, TypeError):
+            aqi_int = None
+        clasificacion, nivel = self._clasificar_y_nivel(aqi_int)
         
         info = {
             'aqi': aqi,
+            'aqi_int': aqi_int,
             'estacion': estacion,
             'coordenadas': coords,
-            'clasificacion': self._clasificar(aqi),
-            'nivel': self._get_nivel(aqi),
+            'clasificacion': clasificacion,
+            'nivel': nivel,
             'contaminantes': {
-                'pm25': iaqi.get('pm25', {}).get('v', 'N/A'),
-                'pm10': iaqi.get('pm10', {}).get('v', 'N/A'),
-                'o3': iaqi.get('o3', {}).get('v', 'N/A'),
-                'no2': iaqi.get('no2', {}).get('v', 'N/A'),
-                'so2': iaqi.get('so2', {}).get('v', 'N/A'),
-                'co': iaqi.get('co', {}).get('v', 'N/A')
+                'pm25': v(iaqi, 'pm25'),
+                'pm10': v(iaqi, 'pm10'),
+                'o3': v(iaqi, 'o3'),
+                'no2': v(iaqi, 'no2'),
+                'so2': v(iaqi, 'so2'),
+                'co': v(iaqi, 'co')
             },
-            'temp': iaqi.get('t', {}).get('v', 'N/A'),
-            'humedad': iaqi.get('h', {}).get('v', 'N/A'),
-            'presion': iaqi.get('p', {}).get('v', 'N/A'),
+            'temp': v(iaqi, 't'),
+            'humedad': v(iaqi, 'h'),
+            'presion': v(iaqi, 'p'),
             'tiempo': tiempo
         }
         return info
     
-    # Clasificar el AQI
-    def _clasificar(self, aqi):
-        if aqi == 'N/A':
-            return 'Desconocido'
-        try:
-            aqi = int(aqi)
-            if aqi <= 50:
-                return 'Bueno'
-            elif aqi <= 100:
-                return 'Moderado'
-            elif aqi <= 150:
-                return 'Danino para grupos sensibles'
-            elif aqi <= 200:
-                return 'Danino'
-            elif aqi <= 300:
-                return 'Muy danino'
-            else:
-                return 'Peligroso'
-        except:
-            return 'Desconocido'
+    # Valor 'v' de un contaminante en iaqi (o 'N/A' si no viene)
+    @staticmethod
+    def _v(iaqi, clave, default='N/A'):
+        entrada = iaqi.get(clave)
+        if entrada is None:
+            return default
+        return entrada.get('v', default)
     
-    # Nivel de peligro
-    def _get_nivel(self, aqi):
-        if aqi == 'N/A':
-            return 'DESCONOCIDO'
-        try:
-            aqi = int(aqi)
-            if aqi <= 50:
-                return 'BAJO'
-            elif aqi <= 100:
-                return 'MEDIO'
-            elif aqi <= 200:
-                return 'ALTO'
-            else:
-                return 'CRITICO'
-        except:
-            return 'DESCONOCIDO'
+    # Clasificacion y nivel de peligro del AQI (aqi_int: int o None)
+    def _clasificar_y_nivel(self, aqi_int):
+        if aqi_int is None:
+            return 'Desconocido', 'DESCONOCIDO'
+        return _info_aqi(aqi_int)[:2]
     
-    # Mostrar datos en consola
+    # Mostrar datos en consola (se arma el informe completo y se escribe de una vez)
     def mostrar_datos(self, ciudad="Mexico"):
         try:
             datos = self.get_calidad_aire(ciudad)
             
-            print("\n" + "=" * 70)
-            print(" INFORME DE CALIDAD DEL AIRE - EcoTech Solutions")
-            print("=" * 70)
-            
-            print(f"\nEstacion: {datos['estacion']}")
-            print(f"Fecha/Hora: {datos['tiempo']}")
-            
-            if datos['coordenadas']:
-                print(f"Coordenadas: {datos['coordenadas']}")
-            
-            print(f"\nIndice AQI: {datos['aqi']}")
-            print(f"Clasificacion: {datos['clasificacion']}")
-            print(f"Nivel de Peligro: {datos['nivel']}")
+            # Datos aplanados para la plantilla (contaminantes al mismo nivel)
+            valores = {**datos, **datos['contaminantes']}
+            valores['linea_coordenadas'] = (
+                f"\nCoordenadas: {datos['coordenadas']}" if datos['coordenadas'] else ""
+            )
             
-            print("\nCONTAMINANTES:")
-            print("-" * 70)
-            cont = datos['contaminantes']
-            print(f"  PM2.5: {cont['pm25']}")
-            print(f"  PM10: {cont['pm10']}")
-            print(f"  O3 (Ozono): {cont['o3']}")
-            print(f"  NO2: {cont['no2']}")
-            print(f"  SO2: {cont['so2']}")
-            print(f"  CO: {cont['co']}")
+            lineas = [_INFORME_TMPL.format_map(valores)]
+            lineas += self._recomendaciones(datos['aqi_int'])
+            lineas.append("\n" + "=" * 70)
             
-            print("\nCONDICIONES METEOROLOGICAS:")
-            print("-" * 70)
-            print(f"  Temperatura: {datos['temp']}C")
-            print(f"  Humedad: {datos['humedad']}%")
-            print(f"  Presion: {datos['presion']} hPa")
-            
-            print("\nANALISIS PARA ECOTECH:")
-            print("-" * 70)
-            self._recomendaciones(datos['aqi'])
-            
-            print("\n" + "=" * 70)
+            sys.stdout.write("\n".join(lineas) + "\n")
             
         except APIError as e:
             print(f"\nError obteniendo datos: {e}")
     
-    # Recomendaciones basadas en AQI
-    def _recomendaciones(self, aqi):
-        try:
-            val = int(aqi) if aqi != 'N/A' else 0
-            
-            if val <= 50:
-                print("  Calidad del aire optima")
-                print("  Buenas condiciones para actividades exteriores")
-            elif val <= 100:
-                print("  Calidad aceptable, monitorear")
-                print("  Considerar estrategias preventivas")
-            elif val <= 200:
-                print("  ALERTA: Implementar medidas inmediatas")
-                print("  Limitar actividades contaminantes")
-            else:
-                print("  CRITICO: Plan de emergencia")
-                print("  Suspender actividades no esenciales")
-        except:
-            print("  No hay datos suficientes")
+    # Recomendaciones basadas en AQI (lineas para el informe)
+    def _recomendaciones(self, aqi_int):
+        if aqi_int is None:
+            return ("  No hay datos suficientes",)
+        return _info_aqi(aqi_int)[2]
     
     # Retornar en formato JSON
     def get_json(self, ciudad="Mexico"):
         try:
             datos = self.get_calidad_aire(ciudad)
-            return json.dumps(datos, indent=2, ensure_ascii=False)
+            return _json_dumps(datos)
         except APIError as e:
-            return json.dumps({'error': str(e)}, indent=2)
+            return _json_dumps({'error': str(e)})
 
 # Funcion de prueba (no la uso mucho)
 # def test_api():
 #     api = ServicioAPI()
 #     api.mostrar_datos("Mexico")
+#     api.close()
@@ -7,16 +7,34 @@ Implementa:
 - Hash y verificación de contraseñas con SHA-256
 """
 import sqlite3
-from typing import Optional, List, Tuple
+from typing import Iterable, Iterator, Optional, List, Tuple
 import hashlib
 import os
 
 DB_RUTA_DEFAULT = os.path.join(os.path.dirname(__file__), "ecotech.db")
 
+# Conexiones abiertas, una por ruta de base de datos
+_conexiones = {}
+
 
 def obtener_conexion(ruta_db: str = DB_RUTA_DEFAULT):
-    """Devuelve una conexión a la base de datos SQLite."""
-    return sqlite3.connect(ruta_db)
+    """Devuelve la conexión a la base de datos SQLite.
+
+    La conexión se abre una sola vez por ruta y se reutiliza en las llamadas
+    siguientes; `with conexion:` sigue haciendo commit/rollback como antes.
+    """
+    conn = _conexiones.get(ruta_db)
+    if conn is None:
+        conn = sqlite3.connect(ruta_db)
+        _conexiones[ruta_db] = conn
+    return conn
+
+
+def cerrar_conexiones() -> None:
+    """Cierra todas las conexiones abiertas por `obtener_conexion`."""
+    for conn in _conexiones.values():
+        conn.close()
+    _conexiones.clear()
 
 
 def inicializar_bd(ruta_db: str = DB_RUTA_DEFAULT):
@@ -182,6 +200,23 @@ def agregar_registro_tiempo(empleado_id: int, proyecto_id: int, fecha: str, hora
         return cursor.lastrowid
 
 
+def agregar_registros_tiempo(registros: Iterable[Tuple[int, int, str, float]],
+                             ruta_db: str = DB_RUTA_DEFAULT) -> int:
+    """Inserta varios registros de tiempo en una sola operación.
+
+    `registros` es una secuencia de tuplas (empleado_id, proyecto_id, fecha, horas).
+    Devuelve la cantidad de filas insertadas.
+    """
+    with obtener_conexion(ruta_db) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO registros_tiempo (empleado_id, proyecto_id, fecha, horas) VALUES (?, ?, ?, ?)",
+            registros
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
 def listar_registros(ruta_db: str = DB_RUTA_DEFAULT) -> List[Tuple]:
     with obtener_conexion(ruta_db) as conn:
         cursor = conn.cursor()
@@ -189,6 +224,18 @@ def listar_registros(ruta_db: str = DB_RUTA_DEFAULT) -> List[Tuple]:
         return cursor.fetchall()
 
 
+def iterar_registros(ruta_db: str = DB_RUTA_DEFAULT) -> Iterator[Tuple]:
+    """Recorre los registros de tiempo fila por fila sin cargarlos todos en memoria.
+
+    Pensado para exportaciones grandes; usa su propio cursor sobre la conexión.
+    """
+    cursor = obtener_conexion(ruta_db).cursor()
+    try:
+        yield from cursor.execute("SELECT id, empleado_id, proyecto_id, fecha, horas FROM registros_tiempo")
+    finally:
+        cursor.close()
+
+
 # ------------------ Funciones adicionales (actualizar / eliminar / consultas) ------------------
 def actualizar_empleado(id_empleado: int, nombre: str, direccion: str, telefono: str,
                         email: str, salario: float, departamento_id: Optional[int],
@@ -2,14 +2,31 @@
 Script auxiliar para generar hashes de contraseñas con bcrypt
 Útil para crear usuarios iniciales o resetear contraseñas
 """
+import os
 import bcrypt
+from dotenv import load_dotenv
 
-def generar_hash(password):
+# Cargar .env antes de leer BCRYPT_ROUNDS (el script tambien se ejecuta sin api.py)
+load_dotenv()
+
+# Costo de bcrypt, compartido con modelos.py (configurable en .env, por defecto 10).
+# Cada punto duplica el tiempo de hash; bcrypt solo acepta valores entre 4 y 31.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 10))
+if not 4 <= BCRYPT_ROUNDS <= 31:
+    raise ValueError(f"BCRYPT_ROUNDS debe estar entre 4 y 31 (valor actual: {BCRYPT_ROUNDS})")
+
+# Tabla para limpiar la respuesta s/n (quita espacios, tabs y saltos de linea)
+_CONFIRM_TABLE = str.maketrans("", "", " \t\r\n")
+
+def generar_hash(password, rounds=BCRYPT_ROUNDS):
     """
     Genera un hash bcrypt para la contraseña proporcionada
     
     Args:
         password (str): Contraseña en texto plano
+        rounds (int): Factor de costo de bcrypt (por defecto BCRYPT_ROUNDS).
+            Cada punto menos reduce el tiempo a la mitad (10 es ~4x más
+            rápido que 12). Usar 4 (el mínimo) solo en pruebas unitarias.
         
     Returns:
         str: Hash bcrypt de la contraseña
@@ -17,8 +34,8 @@ def generar_hash(password):
     # Convertir la contraseña a bytes
     password_bytes = password.encode('utf-8')
     
-    # Generar salt y hash (factor de costo 12 para seguridad óptima)
-    salt = bcrypt.gensalt(rounds=12)
+    # Generar salt y hash (salt nuevo por cada contraseña, nunca compartido)
+    salt = bcrypt.gensalt(rounds=rounds)
     hash_generado = bcrypt.hashpw(password_bytes, salt)
     
     # Retornar como string
@@ -39,7 +56,7 @@ if __name__ == "__main__":
     
     # Permitir generar hashes personalizados
     print("\n¿Deseas generar otro hash? (s/n): ", end="")
-    respuesta = input().strip().lower()
+    respuesta = input().translate(_CONFIRM_TABLE).casefold()
     
     while respuesta == 's':
         nueva_password = input("Ingresa la contraseña: ").strip()
@@ -48,6 +65,6 @@ if __name__ == "__main__":
             print(f"\nHash generado: {nuevo_hash}\n")
         
         print("¿Generar otro? (s/n): ", end="")
-        respuesta = input().strip().lower()
+        respuesta = input().translate(_CONFIRM_TABLE).casefold()
     
     print("\n¡Listo! Puedes usar estos hashes en tu base de datos.")
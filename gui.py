@@ -253,10 +253,12 @@ class Aplicacion(tk.Tk):
         self.lista_empleados.delete(0, tk.END)
         try:
             empleados = db.listar_empleados()
-            for emp in empleados:
-                id_e, nombre, direccion, telefono, email, salario, dep = emp
-                texto = f"#{id_e} - {nombre} | {email} | Salario: {salario} | Dep: {dep or 'N/A'}"
-                self.lista_empleados.insert(tk.END, texto)
+            # Todas las filas en una sola llamada a Tk
+            lineas = [
+                f"#{id_e} - {nombre} | {email} | Salario: {salario} | Dep: {dep or 'N/A'}"
+                for id_e, nombre, direccion, telefono, email, salario, dep in empleados
+            ]
+            self.lista_empleados.insert(tk.END, *lineas)
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo listar empleados: {e}")
 
@@ -295,9 +297,9 @@ class Aplicacion(tk.Tk):
 
     def refrescar_departamentos(self):
         self.lista_departamentos.delete(0, tk.END)
-        for dep in db.listar_departamentos():
-            id_d, nombre, id_gerente = dep
-            self.lista_departamentos.insert(tk.END, f"#{id_d} - {nombre} | Gerente: {id_gerente or 'N/A'}")
+        lineas = [f"#{id_d} - {nombre} | Gerente: {id_gerente or 'N/A'}"
+                  for id_d, nombre, id_gerente in db.listar_departamentos()]
+        self.lista_departamentos.insert(tk.END, *lineas)
 
     def asignar_gerente_seleccionado(self):
         sel = self.lista_departamentos.curselection()
@@ -376,9 +378,8 @@ class Aplicacion(tk.Tk):
 
     def refrescar_proyectos(self):
         self.lista_proyectos.delete(0, tk.END)
-        for p in db.listar_proyectos():
-            id_p, nombre, desc = p
-            self.lista_proyectos.insert(tk.END, f"#{id_p} - {nombre} | {desc}")
+        lineas = [f"#{id_p} - {nombre} | {desc}" for id_p, nombre, desc in db.listar_proyectos()]
+        self.lista_proyectos.insert(tk.END, *lineas)
 
     # ---------------- Registros de tiempo ----------------
     def _construir_tab_registros(self):
@@ -440,9 +441,9 @@ class Aplicacion(tk.Tk):
 
     def refrescar_registros(self):
         self.lista_registros.delete(0, tk.END)
-        for r in db.listar_registros():
-            idr, emp, proj, fecha, horas = r
-            self.lista_registros.insert(tk.END, f"#{idr} - Emp:{emp} | Proj:{proj} | {fecha} | {horas}h")
+        lineas = [f"#{idr} - Emp:{emp} | Proj:{proj} | {fecha} | {horas}h"
+                  for idr, emp, proj, fecha, horas in db.listar_registros()]
+        self.lista_registros.insert(tk.END, *lineas)
 
     def exportar_reporte(self):
         """Exporta todos los registros de tiempo a CSV compatible con Excel.
@@ -450,14 +451,13 @@ class Aplicacion(tk.Tk):
         TAREA 2: Genera 'reporte_timesheets.csv' e intenta abrirlo automáticamente.
         """
         try:
-            registros = db.listar_registros()
             ruta = os.path.join(os.path.dirname(__file__), "reporte_timesheets.csv")
             
             with open(ruta, mode='w', newline='', encoding='utf-8') as f:
                 escritor = csv.writer(f)
                 escritor.writerow(["ID", "Empleado ID", "Proyecto ID", "Fecha", "Horas"])
-                for reg in registros:
-                    escritor.writerow(reg)
+                # Se escribe fila por fila desde el cursor (no carga todo en memoria)
+                escritor.writerows(db.iterar_registros())
             
             messagebox.showinfo("✓ Exportado", f"Reporte generado exitosamente:\n{ruta}\n\nAbriéndolo automáticamente...")
             
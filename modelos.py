@@ -1,7 +1,48 @@
 # Modelos para manejar usuarios y la BD
+import time
+import logging
+import atexit
+import hashlib
+from collections import OrderedDict
 import bcrypt
-from db import get_db
-from mysql.connector import Error
+import db
+from mysql.connector import Error, errorcode
+from generar_hash import BCRYPT_ROUNDS  # mismo costo (y default) que el script de hashes
+
+logger = logging.getLogger(__name__)
+
+# Cache de logins exitosos: {(hash_bd, sha256(password)): expira_en}
+# Si el hash en BD cambia (nuevo password) la clave ya no coincide
+_LOGIN_CACHE_TTL = 60
+_LOGIN_CACHE_MAX = 1024
+_login_cache = OrderedDict()
+
+# Cache de filas de usuarios por nombre: {_clave_usuario(nombre): (fila, expira_en)}
+# Se comparte entre instancias de GestorUsuarios para que una escritura la invalide en todas
+_USUARIO_CACHE_TTL = 30
+_USUARIO_CACHE_MAX = 4096
+_usuario_cache = OrderedDict()
+
+
+# Verificar password evitando repetir bcrypt para la misma credencial reciente
+# Solo se guardan los aciertos: un password incorrecto siempre paga bcrypt
+def _check_password_cache(usuario, password):
+    clave = (usuario._pass_hash, hashlib.sha256(password.encode('utf-8')).digest())
+    ahora = time.monotonic()
+    expira = _login_cache.get(clave)
+    if expira is not None and expira > ahora:
+        _login_cache.move_to_end(clave)
+        return True
+    
+    if not usuario.check_password(password):
+        return False
+    
+    _login_cache[clave] = ahora + _LOGIN_CACHE_TTL
+    _login_cache.move_to_end(clave)
+    if len(_login_cache) > _LOGIN_CACHE_MAX:
+        _login_cache.popitem(last=False)
+    return True
+
 
 # Excepciones para errores de usuarios
 class UsuarioError(Exception):
@@ -11,54 +52,176 @@ class UsuarioError(Exception):
 
 # Clase Usuario
 class Usuario:
+    # Atributos fijos: menos memoria por objeto y acceso mas rapido
+    __slots__ = ('id', 'nombre_usuario', 'correo', 'rol', '_pass_hash')
+    
     def __init__(self, nombre_usuario, correo, rol='usuario', password=None, id=None):
         self.id = id
         self.nombre_usuario = nombre_usuario
         self.correo = correo
         self.rol = rol
-        self._pass_hash = None
+        self._pass_hash = None  # bytes; se decodifica solo al guardarlo en BD
         
         # Hashear password si se proporciona
         if password:
             self.set_password(password)
     
+    # Crear un Usuario directo desde una fila de la BD (sin pasar por __init__)
+    # La fila puede no traer 'password' (ej: listar_todos)
+    @classmethod
+    def from_row(cls, row):
+        usr = cls.__new__(cls)
+        usr.id = row['id']
+        usr.nombre_usuario = row['nombre_usuario']
+        usr.correo = row['correo']
+        usr.rol = row['rol']
+        pass_hash = row.get('password')
+        usr._pass_hash = pass_hash.encode('utf-8') if isinstance(pass_hash, str) else pass_hash
+        return usr
+    
     # Hashear password con bcrypt
     def set_password(self, password):
+        self._pass_hash = Usuario._hash_bytes(password)
+    
+    # Generar el hash bcrypt de un password (bytes)
+    @staticmethod
+    def _hash_bytes(password):
         pw_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt(rounds=12)
-        self._pass_hash = bcrypt.hashpw(pw_bytes, salt).decode('utf-8')
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+        return bcrypt.hashpw(pw_bytes, salt)
+    
+    # Generar el hash bcrypt de un password listo para la BD (sin necesitar un objeto Usuario)
+    @staticmethod
+    def _hash_password(password):
+        return Usuario._hash_bytes(password).decode('utf-8')
     
     # Verificar si el password es correcto
     def check_password(self, password):
         if not self._pass_hash:
             return False
+        # Un hash que no es bcrypt se rechaza sin gastar CPU en checkpw
+        if not self._pass_hash.startswith(b"$2"):
+            return False
         pw_bytes = password.encode('utf-8')
-        hash_bytes = self._pass_hash.encode('utf-8')
-        return bcrypt.checkpw(pw_bytes, hash_bytes)
+        return bcrypt.checkpw(pw_bytes, self._pass_hash)
+    
+    # Ver si el hash fue generado con un costo distinto a BCRYPT_ROUNDS
+    def necesita_rehash(self):
+        try:
+            # Formato: $2b$<costo>$<salt+hash>
+            return int(self._pass_hash[4:6]) != BCRYPT_ROUNDS
+        except (TypeError, ValueError):
+            return False
     
-    # Obtener el hash para guardarlo en BD
+    # Obtener el hash para guardarlo en BD (como str)
     def get_hash(self):
-        return self._pass_hash
+        if self._pass_hash is None:
+            return None
+        return self._pass_hash.decode('utf-8')
     
-    # Setear un hash que ya existe (cuando cargo de BD)
+    # Setear un hash que ya existe (cuando cargo de BD); acepta str o bytes
     def set_hash(self, hash_str):
+        if isinstance(hash_str, str):
+            hash_str = hash_str.encode('utf-8')
         self._pass_hash = hash_str
     
     def __str__(self):
         return f"Usuario({self.nombre_usuario}, {self.correo}, {self.rol})"
 
+
+# Clave de cache para un nombre de usuario. La columna es utf8mb4_unicode_ci:
+# no distingue mayusculas ni espacios al final ('Admin ' es la misma fila que 'admin')
+def _clave_usuario(nombre):
+    return nombre.rstrip().casefold()
+
+
+# Quitar de la cache un usuario (por nombre o por ID) despues de escribir en la BD
+def _invalidar_usuario_cache(nombre=None, id_usr=None):
+    if nombre is not None:
+        _usuario_cache.pop(_clave_usuario(nombre), None)
+    if id_usr is not None:
+        try:
+            id_usr = int(id_usr)
+        except (TypeError, ValueError):
+            return
+        for clave, (datos, _) in list(_usuario_cache.items()):
+            if datos['id'] == id_usr:
+                del _usuario_cache[clave]
+
+
+# Hashes regenerados con BCRYPT_ROUNDS pendientes de guardar: {id: (hash_anterior, hash_nuevo)}
+# Se guardan en lote (un UPDATE) en vez de uno por cada login
+_REHASH_LOTE = 50
+_REHASH_ESPERA_MAX = 30
+_rehash_pendientes = {}
+_rehash_desde = 0.0
+_rehash_db = None  # conexion del ultimo GestorUsuarios que agrego un pendiente
+
+
+# Guardar en BD todos los hashes pendientes con un solo UPDATE
+# Solo se pisa el password si sigue siendo hash_anterior (si cambio mientras tanto, gana el cambio)
+# Si falla se descartan; se volveran a generar en el proximo login de cada usuario
+def _guardar_rehash_pendientes(conexion):
+    if not _rehash_pendientes:
+        return
+    pendientes = list(_rehash_pendientes.items())
+    _rehash_pendientes.clear()
+    
+    casos = " ".join(["WHEN id = %s AND password = %s THEN %s"] * len(pendientes))
+    marcadores = ", ".join(["%s"] * len(pendientes))
+    query = f"UPDATE usuarios SET password = CASE {casos} ELSE password END WHERE id IN ({marcadores})"
+    params = [valor for id_usr, (hash_anterior, hash_nuevo) in pendientes
+              for valor in (id_usr, hash_anterior, hash_nuevo)]
+    params += [id_usr for id_usr, _ in pendientes]
+    try:
+        conexion.ejecutar_query(query, tuple(params), commit=True)
+    except Error as e:
+        logger.warning("No se pudieron guardar %s hashes actualizados: %s", len(pendientes), e)
+        return
+    
+    # La cache todavia tiene el hash anterior
+    for id_usr, _ in pendientes:
+        _invalidar_usuario_cache(id_usr=id_usr)
+
+
+# Descartar el rehash pendiente de un usuario (las claves son int; el ID puede venir como str)
+def _descartar_rehash_pendiente(id_usr):
+    try:
+        _rehash_pendientes.pop(int(id_usr), None)
+    except (TypeError, ValueError):
+        pass
+
+
+# Guardar si el pendiente mas antiguo ya espero _REHASH_ESPERA_MAX segundos
+def _guardar_rehash_si_vencido(conexion):
+    if _rehash_pendientes and time.monotonic() - _rehash_desde >= _REHASH_ESPERA_MAX:
+        _guardar_rehash_pendientes(conexion)
+
+
+# Al cerrar el programa la conexion puede ya no estar disponible: no propagar errores
+def _guardar_rehash_al_salir():
+    if not _rehash_pendientes or _rehash_db is None:
+        return
+    try:
+        _guardar_rehash_pendientes(_rehash_db)
+    except Exception as e:
+        logger.warning("No se pudieron guardar los hashes pendientes al salir: %s", e)
+
+
+atexit.register(_guardar_rehash_al_salir)
+
+
 # Clase para manejar todo el CRUD de usuarios
 class GestorUsuarios:
-    def __init__(self):
-        self.db = get_db()
+    # conexion: cualquier objeto con ejecutar_query(query, params, commit=False)
+    # Si no se pasa, se usa la conexion compartida de db.get_db()
+    def __init__(self, conexion=None):
+        self.db = conexion if conexion is not None else db.get_db()
     
     # Agregar usuario nuevo
+    # nombre_usuario y correo son UNIQUE: un duplicado lo detecta el mismo INSERT
     def agregar_usuario(self, usuario):
         try:
-            # Verificar que no exista
-            if self._existe_usuario(usuario.nombre_usuario, usuario.correo):
-                raise UsuarioError(f"El usuario '{usuario.nombre_usuario}' o correo ya existe")
-            
             query = "INSERT INTO usuarios (nombre_usuario, password, correo, rol) VALUES (%s, %s, %s, %s)"
             params = (
                 usuario.nombre_usuario,
@@ -68,38 +231,38 @@ class GestorUsuarios:
             )
             
             id_nuevo = self.db.ejecutar_query(query, params, commit=True)
+            _invalidar_usuario_cache(nombre=usuario.nombre_usuario)
             usuario.id = id_nuevo
-            print(f"Usuario '{usuario.nombre_usuario}' creado (ID: {id_nuevo})")
+            logger.info("Usuario '%s' creado (ID: %s)", usuario.nombre_usuario, id_nuevo)
             return id_nuevo
-        except UsuarioError:
-            raise
         except Error as e:
+            if e.errno == errorcode.ER_DUP_ENTRY:
+                raise UsuarioError(f"El usuario '{usuario.nombre_usuario}' o correo ya existe")
             raise UsuarioError(f"Error agregando usuario: {e}")
     
-    # Ver si un usuario ya existe
-    def _existe_usuario(self, nombre, correo):
-        query = "SELECT id FROM usuarios WHERE nombre_usuario = %s OR correo = %s"
-        result = self.db.ejecutar_query(query, (nombre, correo))
-        return len(result) > 0
-    
     # Buscar usuario por nombre
     def buscar_por_nombre(self, nombre):
         try:
-            query = "SELECT * FROM usuarios WHERE nombre_usuario = %s"
-            result = self.db.ejecutar_query(query, (nombre,))
-            
-            if not result:
-                raise UsuarioError(f"Usuario '{nombre}' no encontrado")
+            ahora = time.monotonic()
+            clave = _clave_usuario(nombre)
+            entrada = _usuario_cache.get(clave)
+            if entrada is not None and entrada[1] > ahora:
+                _usuario_cache.move_to_end(clave)
+                datos = entrada[0]
+            else:
+                query = "SELECT id, nombre_usuario, correo, rol, password FROM usuarios WHERE nombre_usuario = %s"
+                result = self.db.ejecutar_query(query, (nombre,))
+                
+                if not result:
+                    raise UsuarioError(f"Usuario '{nombre}' no encontrado")
+                
+                datos = result[0]
+                _usuario_cache[clave] = (datos, ahora + _USUARIO_CACHE_TTL)
+                _usuario_cache.move_to_end(clave)
+                if len(_usuario_cache) > _USUARIO_CACHE_MAX:
+                    _usuario_cache.popitem(last=False)
             
-            datos = result[0]
-            usr = Usuario(
-                nombre_usuario=datos['nombre_usuario'],
-                correo=datos['correo'],
-                rol=datos['rol'],
-                id=datos['id']
-            )
-            usr.set_hash(datos['password'])
-            return usr
+            return Usuario.from_row(datos)
         except UsuarioError:
             raise
         except Error as e:
@@ -108,51 +271,32 @@ class GestorUsuarios:
     # Buscar por ID
     def buscar_por_id(self, id_usr):
         try:
-            query = "SELECT * FROM usuarios WHERE id = %s"
+            query = "SELECT id, nombre_usuario, correo, rol, password FROM usuarios WHERE id = %s"
             result = self.db.ejecutar_query(query, (id_usr,))
             
             if not result:
                 raise UsuarioError(f"Usuario ID {id_usr} no encontrado")
             
             datos = result[0]
-            usr = Usuario(
-                nombre_usuario=datos['nombre_usuario'],
-                correo=datos['correo'],
-                rol=datos['rol'],
-                id=datos['id']
-            )
-            usr.set_hash(datos['password'])
-            return usr
+            return Usuario.from_row(datos)
         except UsuarioError:
             raise
         except Error as e:
             raise UsuarioError(f"Error: {e}")
     
-    # Listar todos
+    # Listar todos (sin el hash del password, solo se usa para mostrar)
     def listar_todos(self):
         try:
-            query = "SELECT * FROM usuarios ORDER BY id"
+            query = "SELECT id, nombre_usuario, correo, rol FROM usuarios ORDER BY id"
             result = self.db.ejecutar_query(query)
             
-            usuarios = []
-            for datos in result:
-                usr = Usuario(
-                    nombre_usuario=datos['nombre_usuario'],
-                    correo=datos['correo'],
-                    rol=datos['rol'],
-                    id=datos['id']
-                )
-                usr.set_hash(datos['password'])
-                usuarios.append(usr)
-            return usuarios
+            return [Usuario.from_row(datos) for datos in result]
         except Error as e:
             raise UsuarioError(f"Error listando: {e}")
     
     # Modificar datos de un usuario
     def modificar(self, id_usr, nuevo_correo=None, nuevo_rol=None, nuevo_pass=None):
         try:
-            usuario = self.buscar_por_id(id_usr)
-            
             campos = []
             params = []
             
@@ -165,38 +309,55 @@ class GestorUsuarios:
                 params.append(nuevo_rol)
             
             if nuevo_pass:
-                usr_temp = Usuario('temp', 'temp@t.com', password=nuevo_pass)
                 campos.append("password = %s")
-                params.append(usr_temp.get_hash())
+                params.append(Usuario._hash_password(nuevo_pass))
             
             if not campos:
-                print("No hay nada que modificar")
+                logger.info("No hay nada que modificar")
                 return False
             
             params.append(id_usr)
+            # Un rehash pendiente no debe pisar el password que se modifica ahora
+            _descartar_rehash_pendiente(id_usr)
             
             query = f"UPDATE usuarios SET {', '.join(campos)} WHERE id = %s"
             filas = self.db.ejecutar_query(query, tuple(params), commit=True)
+            _invalidar_usuario_cache(id_usr=id_usr)
             
             if filas > 0:
-                print(f"Usuario ID {id_usr} modificado")
+                logger.info("Usuario ID %s modificado", id_usr)
                 return True
+            
+            # 0 filas: o no existe, o los datos ya eran iguales (MySQL no cuenta esas filas)
+            if not self._existe_id(id_usr):
+                raise UsuarioError(f"Usuario ID {id_usr} no encontrado")
             return False
         except UsuarioError:
             raise
         except Error as e:
             raise UsuarioError(f"Error modificando: {e}")
     
+    # Ver si existe un usuario con ese ID
+    def _existe_id(self, id_usr):
+        result = self.db.ejecutar_query("SELECT id FROM usuarios WHERE id = %s", (id_usr,))
+        return len(result) > 0
+    
     # Eliminar usuario
     def eliminar(self, id_usr):
         try:
-            usuario = self.buscar_por_id(id_usr)
+            # Solo se necesita el nombre para el mensaje
+            result = self.db.ejecutar_query("SELECT nombre_usuario FROM usuarios WHERE id = %s", (id_usr,))
+            if not result:
+                raise UsuarioError(f"Usuario ID {id_usr} no encontrado")
+            nombre = result[0]['nombre_usuario']
             
             query = "DELETE FROM usuarios WHERE id = %s"
             filas = self.db.ejecutar_query(query, (id_usr,), commit=True)
+            _invalidar_usuario_cache(id_usr=id_usr)
+            _descartar_rehash_pendiente(id_usr)
             
             if filas > 0:
-                print(f"Usuario '{usuario.nombre_usuario}' eliminado")
+                logger.info("Usuario '%s' eliminado", nombre)
                 return True
             return False
         except UsuarioError:
@@ -204,14 +365,37 @@ class GestorUsuarios:
         except Error as e:
             raise UsuarioError(f"Error eliminando: {e}")
     
+    # Regenerar el hash con el costo actual (BCRYPT_ROUNDS) tras un login correcto
+    # El UPDATE se acumula y se hace en lote (cada _REHASH_LOTE usuarios o _REHASH_ESPERA_MAX s)
+    def _actualizar_costo_hash(self, usuario, password):
+        global _rehash_desde, _rehash_db
+        if usuario.id in _rehash_pendientes:
+            return
+        hash_anterior = usuario.get_hash()
+        usuario.set_password(password)
+        
+        if not _rehash_pendientes:
+            _rehash_desde = time.monotonic()
+        _rehash_pendientes[usuario.id] = (hash_anterior, usuario.get_hash())
+        _rehash_db = self.db
+        
+        if len(_rehash_pendientes) >= _REHASH_LOTE:
+            _guardar_rehash_pendientes(self.db)
+        else:
+            _guardar_rehash_si_vencido(self.db)
+    
     # Login - verificar usuario y password
     def login(self, nombre, password):
         try:
             # print(f"Intentando login con: {nombre}")  # debug
+            # Cada login revisa si hay hashes pendientes que ya esperaron demasiado
+            _guardar_rehash_si_vencido(self.db)
             usuario = self.buscar_por_nombre(nombre)
             
-            if usuario.check_password(password):
-                print(f"Login OK: {nombre}")
+            if _check_password_cache(usuario, password):
+                logger.info("Login OK: %s", nombre)
+                if usuario.necesita_rehash():
+                    self._actualizar_costo_hash(usuario, password)
                 return usuario
             else:
                 raise UsuarioError("Password incorrecto")
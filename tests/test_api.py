@@ -0,0 +1,119 @@
+import unittest
+from unittest import mock
+import requests
+from api import APIError, ServicioAPI, _info_aqi, _json_dumps
+
+
+# Respuesta HTTP falsa de la API con el AQI dado
+def _respuesta(aqi, status_code=200, last_modified=None):
+    respuesta = mock.Mock(status_code=status_code, headers={})
+    respuesta.content = _json_dumps({'status': 'ok', 'data': {'aqi': aqi, 'iaqi': {}}}).encode('utf-8')
+    if last_modified:
+        respuesta.headers['Last-Modified'] = last_modified
+    return respuesta
+
+
+class TestClasificacionAQI(unittest.TestCase):
+    def test_limites_de_rango(self):
+        casos = [
+            (50, 'Bueno', 'BAJO'),
+            (51, 'Moderado', 'MEDIO'),
+            (100, 'Moderado', 'MEDIO'),
+            (101, 'Danino para grupos sensibles', 'ALTO'),
+            (150, 'Danino para grupos sensibles', 'ALTO'),
+            (151, 'Danino', 'ALTO'),
+            (200, 'Danino', 'ALTO'),
+            (201, 'Muy danino', 'CRITICO'),
+            (300, 'Muy danino', 'CRITICO'),
+            (301, 'Peligroso', 'CRITICO'),
+        ]
+        for aqi, clasificacion, nivel in casos:
+            with self.subTest(aqi=aqi):
+                self.assertEqual(_info_aqi(aqi)[:2], (clasificacion, nivel))
+
+    def test_aqi_no_numerico(self):
+        api = ServicioAPI()
+        for aqi in ('-', 'N/A'):
+            with self.subTest(aqi=aqi):
+                info = api._procesar_datos({'aqi': aqi})
+                self.assertIsNone(info['aqi_int'])
+                self.assertEqual(info['clasificacion'], 'Desconocido')
+                self.assertEqual(info['nivel'], 'DESCONOCIDO')
+                self.assertEqual(api._recomendaciones(info['aqi_int']), ("  No hay datos suficientes",))
+
+
+class TestServicioAPICache(unittest.TestCase):
+    def setUp(self):
+        self.api = ServicioAPI()
+        self.api.clear_cache()
+        self.get = mock.patch.object(self.api.session, 'get').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        self.api.clear_cache()
+
+    # Hace que las entradas de la cache queden vencidas
+    def _vencer_cache(self):
+        for clave, (ts, info, last_modified) in self.api._cache.items():
+            self.api._cache[clave] = (ts - self.api._cache_ttl, info, last_modified)
+
+    def test_consulta_repetida_usa_cache(self):
+        self.get.return_value = _respuesta(42)
+        primera = self.api.get_calidad_aire('Mexico')
+        segunda = self.api.get_calidad_aire('Mexico')
+        self.assertIs(primera, segunda)
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_clave_normalizada(self):
+        self.get.return_value = _respuesta(42)
+        self.api.get_calidad_aire('Mexico')
+        self.api.get_calidad_aire(' mexico ')
+        self.assertEqual(self.get.call_count, 1)
+        self.assertEqual(list(self.api._cache), ['mexico'])
+
+    def test_api_caida_devuelve_dato_vencido(self):
+        self.get.return_value = _respuesta(42)
+        info = self.api.get_calidad_aire('Mexico')
+        self._vencer_cache()
+        self.get.side_effect = requests.exceptions.Timeout()
+
+        with self.assertLogs('api', 'WARNING'):
+            self.assertIs(self.api.get_calidad_aire('Mexico'), info)
+
+    def test_api_caida_sin_cache_lanza_error(self):
+        self.get.side_effect = requests.exceptions.Timeout()
+        with self.assertRaises(APIError):
+            self.api.get_calidad_aire('Mexico')
+
+    def test_revalida_con_if_modified_since(self):
+        lm = 'Wed, 15 Oct 2026 10:00:00 GMT'
+        self.get.return_value = _respuesta(42, last_modified=lm)
+        info = self.api.get_calidad_aire('Mexico')
+        self.assertIsNone(self.get.call_args.kwargs['headers'])
+        self._vencer_cache()
+
+        self.get.return_value = _respuesta(None, status_code=304)
+        self.assertIs(self.api.get_calidad_aire('Mexico'), info)
+        self.assertEqual(self.get.call_args.kwargs['headers'], {'If-Modified-Since': lm})
+
+        # El 304 renueva la entrada: la siguiente consulta no va a la API
+        self.api.get_calidad_aire('Mexico')
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_varias_ciudades_con_una_fallando(self):
+        def get(url, **kwargs):
+            if '/feed/Lima/' in url:
+                raise requests.exceptions.ConnectionError()
+            return _respuesta(42)
+        self.get.side_effect = get
+
+        resultado = self.api.get_calidad_aire_ciudades(['Mexico', 'Lima', 'Bogota'])
+
+        self.assertEqual(list(resultado), ['Mexico', 'Lima', 'Bogota'])
+        self.assertEqual(resultado['Mexico']['aqi_int'], 42)
+        self.assertEqual(resultado['Bogota']['aqi_int'], 42)
+        self.assertIsInstance(resultado['Lima'], APIError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,11 +13,30 @@ class TestDB(unittest.TestCase):
         db.inicializar_bd(ruta_db=self.db_path)
 
     def tearDown(self):
+        db.cerrar_conexiones()
         try:
             os.unlink(self.db_path)
         except Exception:
             pass
 
+    def test_conexion_reutilizada(self):
+        conn1 = db.obtener_conexion(self.db_path)
+        conn2 = db.obtener_conexion(self.db_path)
+        self.assertIs(conn1, conn2)
+
+    def test_agregar_registros_tiempo(self):
+        id_dep = db.agregar_departamento('Lote', ruta_db=self.db_path)
+        id_proj = db.agregar_proyecto('Proyecto Lote', ruta_db=self.db_path)
+        hash_pw = db.hash_contrasena('abc123')
+        id_emp = db.agregar_empleado('Lote', 'Dir', '000', 'lote@test.com', 1000.0, hash_pw, id_dep, ruta_db=self.db_path)
+
+        registros = [(id_emp, id_proj, '2025-12-0%d' % dia, 8.0) for dia in range(1, 6)]
+        filas = db.agregar_registros_tiempo(registros, ruta_db=self.db_path)
+        self.assertEqual(filas, 5)
+        self.assertEqual(len(db.listar_registros(ruta_db=self.db_path)), 5)
+        self.assertEqual(list(db.iterar_registros(ruta_db=self.db_path)),
+                         db.listar_registros(ruta_db=self.db_path))
+
     def test_crud_basico(self):
         # Departamentos
         id_dep = db.agregar_departamento('Pruebas', ruta_db=self.db_path)
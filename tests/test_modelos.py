@@ -0,0 +1,174 @@
+import unittest
+from unittest import mock
+import bcrypt
+import modelos
+
+
+class BDFalsa:
+    """Tabla `usuarios` en memoria que responde las queries de GestorUsuarios.
+
+    Compara nombre_usuario como utf8mb4_unicode_ci (sin mayúsculas ni espacios finales).
+    """
+
+    def __init__(self):
+        self.filas = {}
+        self.queries = []
+        self.siguiente_id = 1
+
+    def agregar(self, nombre, password, rounds):
+        hash_pw = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        id_usr = self.siguiente_id
+        self.siguiente_id += 1
+        self.filas[id_usr] = {'id': id_usr, 'nombre_usuario': nombre, 'correo': f'{nombre}@test.com',
+                              'rol': 'usuario', 'password': hash_pw}
+        return id_usr
+
+    def ejecutar_query(self, query, params=None, commit=False):
+        self.queries.append((query, params))
+        if query.startswith("SELECT id, nombre_usuario, correo, rol, password FROM usuarios WHERE nombre_usuario"):
+            clave = params[0].rstrip().lower()
+            return [dict(f) for f in self.filas.values() if f['nombre_usuario'].lower() == clave]
+        if query.startswith("SELECT nombre_usuario FROM usuarios WHERE id"):
+            fila = self.filas.get(int(params[0]))
+            return [{'nombre_usuario': fila['nombre_usuario']}] if fila else []
+        if query.startswith("SELECT id FROM usuarios WHERE id"):
+            return [{'id': int(params[0])}] if int(params[0]) in self.filas else []
+        if query == "UPDATE usuarios SET password = %s WHERE id = %s":
+            fila = self.filas.get(int(params[1]))
+            if fila:
+                fila['password'] = params[0]
+            return 1 if fila else 0
+        if query.startswith("UPDATE usuarios SET password = CASE WHEN"):
+            n = len(params) // 4
+            filas = 0
+            for i in range(n):
+                id_usr, hash_anterior, hash_nuevo = params[3 * i:3 * i + 3]
+                fila = self.filas.get(id_usr)
+                if fila and fila['password'] == hash_anterior:
+                    fila['password'] = hash_nuevo
+                    filas += 1
+            return filas
+        if query.startswith("DELETE FROM usuarios WHERE id"):
+            return 1 if self.filas.pop(int(params[0]), None) else 0
+        raise AssertionError(f"Query no esperada: {query}")
+
+
+class TestGestorUsuariosCache(unittest.TestCase):
+    def setUp(self):
+        # Costo mínimo de bcrypt para que las pruebas sean rápidas
+        self.rounds = mock.patch.object(modelos, 'BCRYPT_ROUNDS', 4)
+        self.rounds.start()
+        self._limpiar_estado()
+        self.bd = BDFalsa()
+        self.id_admin = self.bd.agregar('admin', 'admin123', rounds=4)
+        self.gestor = modelos.GestorUsuarios(conexion=self.bd)
+
+    def tearDown(self):
+        self._limpiar_estado()
+        self.rounds.stop()
+
+    def _limpiar_estado(self):
+        modelos._login_cache.clear()
+        modelos._usuario_cache.clear()
+        modelos._rehash_pendientes.clear()
+
+    def test_login_repetido_usa_cache(self):
+        with mock.patch.object(modelos.bcrypt, 'checkpw', wraps=bcrypt.checkpw) as checkpw:
+            self.gestor.login('admin', 'admin123')
+            self.gestor.login('Admin ', 'admin123')
+        self.assertEqual(checkpw.call_count, 1)
+        selects = [q for q, _ in self.bd.queries if q.startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+
+    def test_password_incorrecto_no_se_guarda(self):
+        with mock.patch.object(modelos.bcrypt, 'checkpw', wraps=bcrypt.checkpw) as checkpw:
+            for _ in range(2):
+                with self.assertRaises(modelos.UsuarioError):
+                    self.gestor.login('admin', 'incorrecto')
+        self.assertEqual(checkpw.call_count, 2)
+        self.assertEqual(len(modelos._login_cache), 0)
+
+    def test_cambio_de_password_invalida_cache(self):
+        self.gestor.login('admin', 'admin123')
+        self.assertTrue(self.gestor.modificar(self.id_admin, nuevo_pass='nueva456'))
+
+        with self.assertRaises(modelos.UsuarioError):
+            self.gestor.login('admin', 'admin123')
+        self.assertEqual(self.gestor.login('admin', 'nueva456').id, self.id_admin)
+
+    def test_eliminar_invalida_cache(self):
+        self.gestor.login('admin', 'admin123')
+        self.gestor.login('ADMIN', 'admin123')
+        self.assertTrue(self.gestor.eliminar(str(self.id_admin)))
+
+        for nombre in ('admin', 'ADMIN'):
+            with self.assertRaises(modelos.UsuarioError):
+                self.gestor.login(nombre, 'admin123')
+
+    def test_rehash_se_guarda_en_un_update(self):
+        id_otro = self.bd.agregar('otro', 'otro123', rounds=5)
+        id_viejo = self.bd.agregar('viejo', 'viejo123', rounds=5)
+
+        with mock.patch.object(modelos, '_REHASH_LOTE', 2):
+            self.gestor.login('otro', 'otro123')
+            self.assertIn(id_otro, modelos._rehash_pendientes)
+            self.gestor.login('viejo', 'viejo123')
+
+        query, params = self.bd.queries[-1]
+        self.assertEqual(query, "UPDATE usuarios SET password = CASE "
+                                "WHEN id = %s AND password = %s THEN %s "
+                                "WHEN id = %s AND password = %s THEN %s "
+                                "ELSE password END WHERE id IN (%s, %s)")
+        self.assertEqual((params[0], params[3]), (id_otro, id_viejo))
+        self.assertEqual(params[6:], (id_otro, id_viejo))
+        self.assertTrue(params[1].startswith('$2b$05$'))
+        self.assertTrue(params[2].startswith('$2b$04$'))
+        self.assertTrue(params[4].startswith('$2b$05$'))
+        self.assertTrue(params[5].startswith('$2b$04$'))
+        self.assertEqual(modelos._rehash_pendientes, {})
+        self.assertTrue(self.bd.filas[id_viejo]['password'].startswith('$2b$04$'))
+
+    def test_rehash_vencido_se_guarda_en_el_siguiente_login(self):
+        id_viejo = self.bd.agregar('viejo', 'viejo123', rounds=5)
+        self.gestor.login('viejo', 'viejo123')
+        self.assertIn(id_viejo, modelos._rehash_pendientes)
+
+        with mock.patch.object(modelos, '_REHASH_ESPERA_MAX', 0):
+            self.gestor.login('admin', 'admin123')
+        self.assertEqual(modelos._rehash_pendientes, {})
+        self.assertTrue(self.bd.filas[id_viejo]['password'].startswith('$2b$04$'))
+
+    def test_modificar_con_id_str_descarta_rehash_pendiente(self):
+        id_viejo = self.bd.agregar('viejo', 'viejo123', rounds=5)
+        self.gestor.login('viejo', 'viejo123')
+        self.assertIn(id_viejo, modelos._rehash_pendientes)
+
+        self.assertTrue(self.gestor.modificar(str(id_viejo), nuevo_pass='nueva456'))
+        self.assertEqual(modelos._rehash_pendientes, {})
+        modelos._guardar_rehash_pendientes(self.bd)
+
+        with self.assertRaises(modelos.UsuarioError):
+            self.gestor.login('viejo', 'viejo123')
+        self.assertEqual(self.gestor.login('viejo', 'nueva456').id, id_viejo)
+
+    def test_rehash_no_pisa_password_cambiado_en_otra_parte(self):
+        id_viejo = self.bd.agregar('viejo', 'viejo123', rounds=5)
+        self.gestor.login('viejo', 'viejo123')
+        self.assertIn(id_viejo, modelos._rehash_pendientes)
+
+        # Otro proceso cambia el password directamente en la BD
+        nuevo = bcrypt.hashpw(b'nueva456', bcrypt.gensalt(rounds=4)).decode('utf-8')
+        self.bd.filas[id_viejo]['password'] = nuevo
+        modelos._guardar_rehash_pendientes(self.bd)
+
+        self.assertEqual(self.bd.filas[id_viejo]['password'], nuevo)
+
+    def test_eliminar_descarta_rehash_pendiente(self):
+        id_viejo = self.bd.agregar('viejo', 'viejo123', rounds=5)
+        self.gestor.login('viejo', 'viejo123')
+        self.assertTrue(self.gestor.eliminar(str(id_viejo)))
+        self.assertEqual(modelos._rehash_pendientes, {})
+
+
+if __name__ == '__main__':
+    unittest.main()